@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 import argparse
+import io
 import os
+import struct
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from typing import Optional, Tuple, Dict, Any
 
@@ -20,7 +24,7 @@ try:
 except Exception:
     pass
 
-# Optional EXIF-bytes parser (used for HEIC fallback)
+# Optional EXIF-bytes parser (fallback for EXIF blocks our own GPS IFD walker can't handle)
 have_piexif = False
 try:
     import piexif  # type: ignore
@@ -28,19 +32,72 @@ try:
 except Exception:
     pass
 
-IMG_EXTS = {".jpg", ".jpeg", ".tif", ".tiff", ".heic", ".heif"}
+# A tuple so it can go straight into str.endswith(); none is longer than 5 chars
+IMG_EXTS = (".jpg", ".jpeg", ".tif", ".tiff", ".heic", ".heif")
+
+# How much of each file the raw EXIF reader looks at before giving up and letting Pillow handle it
+EXIF_SCAN_BYTES = 65536
+
+# Below this many images the process pool's startup cost outweighs the parallel speedup
+MIN_PARALLEL_IMAGES = 16
 
 # Build tag maps once
 TAGS = {v: k for k, v in ExifTags.TAGS.items()}
-GPSTAGS = {v: k for k, v in ExifTags.GPSTAGS.items()}
+GPS_INFO_TAG = ExifTags.IFD.GPSInfo if hasattr(ExifTags, "IFD") else TAGS["GPSInfo"]
+
+# GPS IFD tag ids (EXIF spec; same values as piexif.GPSIFD)
+GPS_LAT_REF = 1
+GPS_LAT = 2
+GPS_LON_REF = 3
+GPS_LON = 4
+GPS_ALT_REF = 5
+GPS_ALT = 6
+
+def iter_images(root: str):
+    """
+    Recursively yield os.DirEntry objects for image files under root.
+    Uses os.scandir directly so directory checks come from d_type instead of a stat per entry.
+    Files reached more than once (hardlinks, symlinks to the same image) are only yielded the first time.
+    """
+    seen = set()
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append(e.path)
+                        continue
+                except OSError:
+                    continue
+                if not e.name[-5:].lower().endswith(IMG_EXTS):
+                    continue
+                try:
+                    st = e.stat()
+                except OSError:
+                    yield e  # e.g. a dangling symlink; let the reader report it as skipped
+                    continue
+                # st_ino is 0 on filesystems that don't report one (common on Windows)
+                if st.st_ino:
+                    key = (st.st_dev, st.st_ino)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                yield e
 
 def rational_to_float(x):
     try:
-        if hasattr(x, "numerator") and hasattr(x, "denominator"):
-            return float(x.numerator) / float(x.denominator) if x.denominator else float(x.numerator)
+        # (num, den) pairs from the raw-bytes path come first: it's the common one
         if isinstance(x, tuple) and len(x) == 2:
             num, den = x
-            return float(num) / float(den) if den else float(num)
+            return num / den if den else float(num)
+        if hasattr(x, "numerator") and hasattr(x, "denominator"):
+            return float(x.numerator) / float(x.denominator) if x.denominator else float(x.numerator)
         return float(x)
     except Exception:
         return None
@@ -49,9 +106,7 @@ def dms_to_deg(dms, ref: Optional[str]) -> Optional[float]:
     try:
         if not dms or len(dms) != 3:
             return None
-        d = rational_to_float(dms[0])
-        m = rational_to_float(dms[1])
-        s = rational_to_float(dms[2])
+        d, m, s = map(rational_to_float, dms)
         if d is None or m is None or s is None:
             return None
         deg = d + (m / 60.0) + (s / 3600.0)
@@ -61,46 +116,109 @@ def dms_to_deg(dms, ref: Optional[str]) -> Optional[float]:
     except Exception:
         return None
 
-def extract_gps_from_pil_exif(exif: Dict[int, Any]) -> Optional[Tuple[float, float, Optional[float]]]:
+def extract_gps_from_pil_exif(exif: Any) -> Optional[Tuple[float, float, Optional[float]]]:
     if not exif:
         return None
-    gps_ifd_tag = TAGS.get("GPSInfo")
-    if gps_ifd_tag is None or gps_ifd_tag not in exif:
-        return None
-    gps_ifd = exif[gps_ifd_tag]
-    if not isinstance(gps_ifd, dict):
+    if hasattr(exif, "get_ifd"):
+        gps_ifd = exif.get_ifd(GPS_INFO_TAG)
+    else:
+        # Very old Pillow: a plain dict with the decoded GPS IFD stored under GPSInfo
+        gps_ifd = exif.get(GPS_INFO_TAG)
+    if not gps_ifd or not isinstance(gps_ifd, dict):
         return None
 
-    gps = {GPSTAGS.get(k, k): v for k, v in gps_ifd.items()}
-    lat = dms_to_deg(gps.get("GPSLatitude"), gps.get("GPSLatitudeRef"))
-    lon = dms_to_deg(gps.get("GPSLongitude"), gps.get("GPSLongitudeRef"))
+    lat = dms_to_deg(gps_ifd.get(GPS_LAT), gps_ifd.get(GPS_LAT_REF))
+    lon = dms_to_deg(gps_ifd.get(GPS_LON), gps_ifd.get(GPS_LON_REF))
     alt = None
-    if "GPSAltitude" in gps:
-        a = rational_to_float(gps.get("GPSAltitude"))
-        ref = gps.get("GPSAltitudeRef", 0)
+    if GPS_ALT in gps_ifd:
+        a = rational_to_float(gps_ifd[GPS_ALT])
+        ref = gps_ifd.get(GPS_ALT_REF, 0)
+        if isinstance(ref, bytes):  # Pillow hands BYTE tags back as b"\x01"
+            ref = ref[0] if ref else 0
         if a is not None:
             alt = -a if ref == 1 else a
     if lat is None or lon is None:
         return None
     return (lat, lon, alt)
 
+# Byte sizes of the TIFF field types a GPS IFD can use
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 8: 2, 9: 4, 10: 8}
+_TIFF_INT_FORMATS = {3: "H", 4: "I", 8: "h", 9: "i"}
+
+def _parse_gps_ifd(tiff: bytes) -> Optional[Dict[int, Any]]:
+    """
+    Minimal TIFF walker: find the GPS IFD via the 0th IFD's GPSInfo pointer and decode just tags 1-6,
+    with values shaped like piexif.load()'s "GPS" dict. Returns {} when there is no GPS IFD and
+    None when the data looks unexpected (the caller falls back to piexif).
+    """
+    if tiff[:2] == b"MM":
+        e = ">"
+    elif tiff[:2] == b"II":
+        e = "<"
+    else:
+        return None
+    try:
+        ifd = struct.unpack_from(e + "I", tiff, 4)[0]
+        count = struct.unpack_from(e + "H", tiff, ifd)[0]
+        gps_off = None
+        for i in range(count):
+            tag, _, _, value = struct.unpack_from(e + "HHI4s", tiff, ifd + 2 + 12 * i)
+            if tag == 0x8825:
+                gps_off = struct.unpack_from(e + "I", value)[0]
+                break
+        if gps_off is None:
+            return {}
+
+        gps = {}
+        count = struct.unpack_from(e + "H", tiff, gps_off)[0]
+        for i in range(count):
+            pos = gps_off + 2 + 12 * i
+            tag, typ, n = struct.unpack_from(e + "HHI", tiff, pos)
+            if not GPS_LAT_REF <= tag <= GPS_ALT:
+                continue
+            size = _TIFF_TYPE_SIZES.get(typ)
+            if size is None or n == 0:
+                return None
+            data = pos + 8 if size * n <= 4 else struct.unpack_from(e + "I", tiff, pos + 8)[0]
+            if data + size * n > len(tiff):
+                return None
+            if typ == 2:  # ASCII
+                value = tiff[data:data + n].rstrip(b"\0")
+            elif typ == 7:  # UNDEFINED
+                value = tiff[data:data + n]
+            elif typ in (5, 10):  # (S)RATIONAL
+                nums = struct.unpack_from(f"{e}{2 * n}{'I' if typ == 5 else 'i'}", tiff, data)
+                value = tuple(zip(nums[::2], nums[1::2]))
+            else:
+                value = tiff[data:data + n] if typ == 1 else struct.unpack_from(f"{e}{n}{_TIFF_INT_FORMATS[typ]}", tiff, data)
+                value = tuple(value)
+            if typ not in (2, 7) and n == 1:
+                value = value[0]
+            gps[tag] = value
+        return gps
+    except struct.error:
+        return None
+
 def extract_gps_from_piexif_bytes(exif_bytes: bytes) -> Optional[Tuple[float, float, Optional[float]]]:
-    if not (have_piexif and exif_bytes):
+    if not exif_bytes:
         return None
     try:
-        ex = piexif.load(exif_bytes)
-        gps_ifd = ex.get("GPS", {})
+        gps_ifd = _parse_gps_ifd(exif_bytes)
+        if gps_ifd is None:
+            # Something our walker didn't expect; let piexif have a go at the whole thing
+            if not have_piexif:
+                return None
+            gps_ifd = piexif.load(exif_bytes).get("GPS", {})
         if not gps_ifd:
             return None
-        # Keys per EXIF spec
-        lat = dms_to_deg(gps_ifd.get(piexif.GPSIFD.GPSLatitude),
-                         gps_ifd.get(piexif.GPSIFD.GPSLatitudeRef, b"").decode("ascii", "ignore") or None)
-        lon = dms_to_deg(gps_ifd.get(piexif.GPSIFD.GPSLongitude),
-                         gps_ifd.get(piexif.GPSIFD.GPSLongitudeRef, b"").decode("ascii", "ignore") or None)
+        lat = dms_to_deg(gps_ifd.get(GPS_LAT),
+                         gps_ifd.get(GPS_LAT_REF, b"").decode("ascii", "ignore") or None)
+        lon = dms_to_deg(gps_ifd.get(GPS_LON),
+                         gps_ifd.get(GPS_LON_REF, b"").decode("ascii", "ignore") or None)
         alt = None
-        if piexif.GPSIFD.GPSAltitude in gps_ifd:
-            a = rational_to_float(gps_ifd[piexif.GPSIFD.GPSAltitude])
-            ref = gps_ifd.get(piexif.GPSIFD.GPSAltitudeRef, 0)
+        if GPS_ALT in gps_ifd:
+            a = rational_to_float(gps_ifd[GPS_ALT])
+            ref = gps_ifd.get(GPS_ALT_REF, 0)
             if a is not None:
                 alt = -a if ref == 1 else a
         if lat is None or lon is None:
@@ -109,68 +227,261 @@ def extract_gps_from_piexif_bytes(exif_bytes: bytes) -> Optional[Tuple[float, fl
     except Exception:
         return None
 
-def get_exif_any(path: Path) -> Dict[int, Any]:
+def _jpeg_exif(f, buf: bytes) -> Optional[bytes]:
+    # Walk the JPEG markers after SOI looking for an APP1 "Exif\0\0" segment
+    pos = 2
+    while pos + 4 <= len(buf):
+        if buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # standalone markers
+            pos += 2
+            continue
+        if marker in (0xD9, 0xDA):  # EOI / SOS: no more metadata
+            return None
+        seglen = struct.unpack_from(">H", buf, pos + 2)[0]
+        if marker == 0xE1 and buf[pos + 4:pos + 10] == b"Exif\0\0":
+            end = pos + 2 + seglen
+            if end > len(buf):
+                buf += f.read(end - len(buf))
+            return buf[pos + 10:end]
+        pos += 2 + seglen
+    return None
+
+def _heif_exif(f, buf: bytes) -> Optional[bytes]:
+    # Locate the "Exif" item of an ISO-BMFF (HEIC/HEIF) file via its meta box: iinf gives the
+    # item id, iloc gives where the item's bytes live in the file.
+    def boxes(start, end):
+        pos = start
+        while pos + 8 <= end:
+            size, btype = struct.unpack_from(">I4s", buf, pos)
+            hdr = 8
+            if size == 1:
+                size = struct.unpack_from(">Q", buf, pos + 8)[0]
+                hdr = 16
+            elif size == 0:
+                size = end - pos
+            if size < hdr:
+                return
+            yield btype, pos + hdr, pos + size
+            pos += size
+
+    meta = next(((s, e) for t, s, e in boxes(0, len(buf)) if t == b"meta"), None)
+    if meta is None or meta[1] > len(buf):
+        return None
+
+    exif_id = None
+    iloc = None
+    for btype, s, e in boxes(meta[0] + 4, meta[1]):  # meta is a FullBox
+        if btype == b"iinf":
+            version = buf[s]
+            pos = s + 4 + (2 if version == 0 else 4)
+            for itype, is_, ie in boxes(pos, e):
+                if itype != b"infe" or buf[is_] < 2:
+                    continue
+                if buf[is_] == 2:
+                    item_id, = struct.unpack_from(">H", buf, is_ + 4)
+                    item_type = buf[is_ + 8:is_ + 12]
+                else:
+                    item_id, = struct.unpack_from(">I", buf, is_ + 4)
+                    item_type = buf[is_ + 10:is_ + 14]
+                if item_type == b"Exif":
+                    exif_id = item_id
+                    break
+        elif btype == b"iloc":
+            iloc = (s, e)
+    if exif_id is None or iloc is None:
+        return None
+
+    s, end = iloc
+    version = buf[s]
+    if version > 2:
+        return None
+    offset_size = buf[s + 4] >> 4
+    length_size = buf[s + 4] & 0x0F
+    base_offset_size = buf[s + 5] >> 4
+    index_size = buf[s + 5] & 0x0F if version in (1, 2) else 0
+    id_size = 2 if version < 2 else 4
+    pos = s + 6
+
+    def read_uint(n):
+        nonlocal pos
+        v = int.from_bytes(buf[pos:pos + n], "big") if n else 0
+        pos += n
+        return v
+
+    # Counts come straight from the file; make sure the entries they promise fit in the box,
+    # so a corrupt header can't send us round these loops billions of times
+    item_count = read_uint(id_size)
+    min_item_size = id_size + (2 if version in (1, 2) else 0) + 2 + base_offset_size + 2
+    if pos + item_count * min_item_size > end:
+        return None
+    extent_size = index_size + offset_size + length_size
+    for _ in range(item_count):
+        item_id = read_uint(id_size)
+        construction_method = read_uint(2) & 0x0F if version in (1, 2) else 0
+        read_uint(2)  # data_reference_index
+        base_offset = read_uint(base_offset_size)
+        extent_count = read_uint(2)
+        if pos > end or pos + extent_count * extent_size > end:
+            return None
+        extents = []
+        for _ in range(extent_count):
+            read_uint(index_size)
+            extents.append((read_uint(offset_size), read_uint(length_size)))
+        if item_id != exif_id:
+            continue
+        if construction_method != 0 or not extents:
+            return None
+        data = b""
+        for off, length in extents:
+            f.seek(base_offset + off)
+            data += f.read(length)
+        # Exif item payload: 4-byte offset to the TIFF header, then the TIFF structure
+        if len(data) < 4:
+            return None
+        tiff = data[4 + struct.unpack_from(">I", data)[0]:]
+        return tiff if tiff[:2] in (b"II", b"MM") else None
+    return None
+
+def _read_exif_bytes(path: str) -> Optional[bytes]:
+    """
+    Pull the TIFF-structured EXIF block straight out of the file without going through Pillow.
+    Handles JPEG (APP1), small TIFFs and HEIC/HEIF (Exif item); returns None when it can't find it.
+    """
+    try:
+        # Buffered on purpose: BufferedReader.read(n) keeps reading until it has n bytes or hits EOF,
+        # so a short read from the OS can't truncate the EXIF block
+        with open(path, "rb") as f:
+            buf = f.read(EXIF_SCAN_BYTES)
+            if buf[:2] == b"\xff\xd8":
+                return _jpeg_exif(f, buf)
+            if buf[:4] in (b"II*\0", b"MM\0*"):
+                # IFDs can sit anywhere in a TIFF; only take it if we read the whole file
+                return buf if len(buf) < EXIF_SCAN_BYTES else None
+            if buf[4:8] == b"ftyp":
+                return _heif_exif(f, buf)
+    except Exception:
+        pass
+    return None
+
+def _has_gps_pointer(tiff: bytes) -> bool:
+    """
+    Cheap pre-check on a TIFF-structured EXIF block: does the 0th IFD contain the GPSInfo (0x8825) tag?
+    A plain substring search over the IFD's entries, so it can report false positives but not false negatives.
+    """
+    if len(tiff) < 8:
+        return False
+    if tiff[:2] == b"MM":
+        endian, pattern = ">", b"\x88\x25"
+    elif tiff[:2] == b"II":
+        endian, pattern = "<", b"\x25\x88"
+    else:
+        return False
+    ifd = struct.unpack_from(endian + "I", tiff, 4)[0]
+    if ifd + 2 > len(tiff):
+        return False
+    count = struct.unpack_from(endian + "H", tiff, ifd)[0]
+    return pattern in tiff[ifd + 2:ifd + 2 + 12 * count]
+
+def read_gps(path: str) -> Optional[Tuple[float, float, Optional[float]]]:
     """
-    Try PIL's getexif(); if empty for HEIC, attempt to pull EXIF bytes and parse via piexif.
-    Returns a PIL-style exif dict when possible; otherwise an empty dict (and we’ll use the piexif path).
+    Return (lat, lon, alt) for an image, or None if it has no usable GPS data.
+    Tries reading the EXIF bytes directly from the file first; failing that, PIL's getexif(),
+    and if that has no GPS, raw EXIF bytes from Pillow / pillow-heif.
     """
+    # Fast path: skip Pillow entirely when we can find the EXIF block ourselves
+    exif_bytes = _read_exif_bytes(path)
+    if exif_bytes:
+        # No GPS IFD pointer means no GPS; don't bother parsing (or opening) anything else
+        if not _has_gps_pointer(exif_bytes):
+            return None
+        return extract_gps_from_piexif_bytes(exif_bytes)
     try:
         with Image.open(path) as im:
-            exif = im.getexif() or {}
-            # If we already got GPS via PIL, we're done.
-            if extract_gps_from_pil_exif(dict(exif) if exif else {}) is not None:
-                return dict(exif)
-            # Fallback: try raw EXIF bytes
-            exif_bytes = None
-            # Some formats expose EXIF bytes here:
-            if hasattr(im, "info"):
-                exif_bytes = im.info.get("exif")
-            # HEIC-specific: pull from pillow-heif metadata
-            if (not exif_bytes) and have_pillow_heif and path.suffix.lower() in (".heic", ".heif"):
+            gps = extract_gps_from_pil_exif(im.getexif())
+            if gps is not None:
+                return gps
+            # Fallback: try raw EXIF bytes. Some formats expose them here (pillow-heif's opener does for HEIC):
+            exif_bytes = im.info.get("exif") if hasattr(im, "info") else None
+            # HEIC-specific: only ask pillow-heif directly if it wasn't the one that opened the file,
+            # since otherwise im.info already holds everything it would tell us.
+            if (not exif_bytes and have_pillow_heif and im.format != "HEIF"
+                    and os.path.splitext(path)[1].lower() in (".heic", ".heif")):
                 try:
-                    h = pillow_heif.open_heif(str(path))
-                    for md in h.metadata or []:
-                        if md.get("type") == "Exif" and md.get("data"):
-                            exif_bytes = md["data"]
-                            break
+                    # Only the container is parsed here; no pixel data is decoded
+                    h = pillow_heif.open_heif(path, convert_hdr_to_8bit=False)
+                    exif_bytes = h.info.get("exif")
                 except Exception:
                     pass
-            # If we found EXIF bytes, we won't convert to PIL dict here; we will parse for GPS later.
-            if exif_bytes:
-                # Stash bytes for caller by returning a sentinel dict containing raw bytes
-                return {"__RAW_EXIF_BYTES__": exif_bytes}
-            return dict(exif) if exif else {}
+            return extract_gps_from_piexif_bytes(exif_bytes) if exif_bytes else None
     except Exception:
-        return {}
+        return None
+
+def _gps_for(path: str, folder: str) -> Optional[bytes]:
+    """
+    Per-file worker: returns the finished, UTF-8 encoded <Placemark> XML for the image, or None if no GPS.
+    Formatting and encoding happen here so they run in the pool too; main() only has to write the bytes out.
+    Top-level so it can be pickled for the process pool. read_gps() swallows its own errors,
+    so nothing here should raise for a bad file.
+    """
+    gps = read_gps(path)
+    if gps is None:
+        return None
+
+    try:
+        rel = os.path.relpath(path, folder)
+    except ValueError:  # e.g. different drive on Windows
+        rel = path
+    lat, lon, alt = gps
+    # Undecodable filenames (surrogate-escaped on POSIX) get "?" rather than failing the whole scan
+    return placemark_xml(os.path.basename(path), lat, lon, alt, rel).encode("utf-8", "replace")
+
+KML_FOOTER = "  </Document>\n</kml>\n"
+_KML_FOOTER_BYTES = KML_FOOTER.encode("utf-8")
+
+def kml_header(doc_name: str) -> str:
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+            '  <Document>\n'
+            f'    <name>{xml_escape(doc_name)}</name>\n')
+
+def placemark_xml(name: str, lat: float, lon: float, alt: Optional[float] = None, desc: str = "") -> str:
+    coords = f"{lon},{lat}" if alt is None else f"{lon},{lat},{alt}"
+    desc_xml = f"      <description>{xml_escape(desc)}</description>\n" if desc else ""
+    return (f"    <Placemark>\n      <name>{xml_escape(name)}</name>\n{desc_xml}"
+            f"      <Point><coordinates>{coords}</coordinates></Point>\n    </Placemark>\n")
+
+def write_kml(fragments: list, doc_name: str, out_path: Path) -> None:
+    """Write a KML document from placemark_xml() fragments already encoded as UTF-8 bytes."""
+    # Stream straight to the file, in binary so there's no text-layer encode pass over the whole document
+    with open(out_path, "wb", buffering=1 << 20) as f:
+        f.write(kml_header(doc_name).encode("utf-8", "replace"))
+        f.writelines(fragments)
+        f.write(_KML_FOOTER_BYTES)
 
 def build_kml(placemarks: list, doc_name: str) -> str:
-    header = f'''<?xml version="1.0" encoding="UTF-8"?>
-<kml xmlns="http://www.opengis.net/kml/2.2">
-  <Document>
-    <name>{xml_escape(doc_name)}</name>
-'''
-    body_parts = []
+    buf = io.StringIO()
+    w = buf.write
+    w(kml_header(doc_name))
     for pm in placemarks:
-        coords = f'{pm["lon"]},{pm["lat"]}'
-        if pm.get("alt") is not None:
-            coords = f'{coords},{pm["alt"]}'
-        name = xml_escape(pm["name"])
-        desc = xml_escape(pm.get("desc", ""))
-        body_parts.append(f'''    <Placemark>
-      <name>{name}</name>
-      {"<description>"+desc+"</description>" if desc else ""}
-      <Point><coordinates>{coords}</coordinates></Point>
-    </Placemark>
-''')
-    footer = "  </Document>\n</kml>\n"
-    return header + "".join(body_parts) + footer
+        w(placemark_xml(pm["name"], pm["lat"], pm["lon"], pm.get("alt"), pm.get("desc", "")))
+    w(KML_FOOTER)
+    return buf.getvalue()
+
+_XML_TR = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&apos;",
+})
 
 def xml_escape(s: str) -> str:
-    return (s.replace("&", "&amp;")
-             .replace("<", "&lt;")
-             .replace(">", "&gt;")
-             .replace('"', "&quot;")
-             .replace("'", "&apos;"))
+    return s.translate(_XML_TR)
 
 def main():
     ap = argparse.ArgumentParser(description="Scan a folder for geotagged images and generate a KML with placemarks named after the image files.")
@@ -185,53 +496,26 @@ def main():
 
     out_path = Path(args.output).expanduser().resolve() if args.output else (folder / f"{folder.name}_images.kml")
 
-    placemarks = []
-    total = 0
-    with_gps = 0
-    skipped = 0
+    folder_str = str(folder)
+    paths = [e.path for e in iter_images(folder_str)]
+    total = len(paths)
 
-    for root, _, files in os.walk(folder):
-        for fname in files:
-            p = Path(root) / fname
-            if p.suffix.lower() not in IMG_EXTS:
-                continue
-            total += 1
-            try:
-                exif_or_raw = get_exif_any(p)
-
-                gps = None
-                # First try normal PIL exif dict
-                if "__RAW_EXIF_BYTES__" not in exif_or_raw:
-                    gps = extract_gps_from_pil_exif(exif_or_raw)
-                # Fallback: parse raw EXIF bytes (works great for HEIC)
-                if gps is None and "__RAW_EXIF_BYTES__" in exif_or_raw:
-                    gps = extract_gps_from_piexif_bytes(exif_or_raw["__RAW_EXIF_BYTES__"])
-
-                if gps is None:
-                    skipped += 1
-                    continue
+    if total < MIN_PARALLEL_IMAGES:
+        results = map(_gps_for, paths, repeat(folder_str))
+        fragments = [r for r in results if r]
+    else:
+        with ProcessPoolExecutor() as ex:
+            fragments = [r for r in ex.map(_gps_for, paths, repeat(folder_str), chunksize=32) if r]
+    with_gps = len(fragments)
+    skipped = total - with_gps
 
-                lat, lon, alt = gps
-                placemarks.append({
-                    "name": p.name,
-                    "lat": lat,
-                    "lon": lon,
-                    "alt": alt,
-                    "desc": str(p.relative_to(folder))
-                })
-                with_gps += 1
-            except Exception as e:
-                skipped += 1
-                print(f"[WARN] {p}: {e}", file=sys.stderr)
-
-    if not placemarks:
+    if not fragments:
         print("No geotagged images found. No KML written.", file=sys.stderr)
         print(f"Scanned {total} images; {with_gps} with GPS; {skipped} skipped.", file=sys.stderr)
         return 4
 
-    kml = build_kml(placemarks, f"{folder.name} (Geotagged Images)")
     try:
-        out_path.write_text(kml, encoding="utf-8")
+        write_kml(fragments, f"{folder.name} (Geotagged Images)", out_path)
     except Exception as e:
         print(f"Failed to write KML: {e}", file=sys.stderr)
         return 5